@@ -0,0 +1,60 @@
+"""Logging configuration for real-time data warehouse."""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+)
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def configure_logger(
+    name: str,
+    path: str,
+    library_loggers: tuple[str, ...] = ()
+) -> logging.Logger:
+    """
+    Configure a logger that writes to a rotating file in the background.
+
+    Callers only pay for a queue put; a QueueListener thread formats the
+    records and writes them to the file.
+
+    Args:
+        name: Name of the logger to configure
+        path: Path of the log file
+        library_loggers: Names of third-party loggers whose records
+            should also be written to the file
+
+    Returns:
+        logging.Logger: The configured logger
+    """
+    logger = logging.getLogger(name)
+    if logger.handlers:
+        return logger
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    file_handler = RotatingFileHandler(
+        path, maxBytes=100 << 20, backupCount=5
+    )
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+
+    queue_handler = QueueHandler(log_queue)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(queue_handler)
+    for library in library_loggers:
+        logging.getLogger(library).addHandler(queue_handler)
+
+    return logger
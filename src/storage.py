@@ -1,19 +1,31 @@
 """Storage module for real-time data warehouse."""
 
 import logging
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Union
 
-from pymongo import MongoClient, UpdateOne
-from pymongo.errors import BulkWriteError
+from pymongo import IndexModel, InsertOne, MongoClient, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    filename='logs/storage.log'
+from .logging_config import configure_logger
+
+logger = configure_logger(__name__, 'logs/storage.log', ('pymongo',))
+
+# Successful operations are logged at INFO once per this many events.
+LOG_SAMPLE_INTERVAL = 10000
+
+DUPLICATE_KEY_ERROR = 11000
+
+# Upserts filter on event_id, so every event collection needs this index.
+# Only string IDs are indexed: events dumped before an ID was generated
+# carry event_id None, and those must not collide with each other.
+EVENT_ID_INDEX = IndexModel(
+    'event_id',
+    name='event_id_unique',
+    unique=True,
+    partialFilterExpression={'event_id': {'$type': 'string'}}
 )
-logger = logging.getLogger(__name__)
 
 
 class DataWarehouseStorage:
@@ -23,12 +35,32 @@ class DataWarehouseStorage:
         self,
         mongodb_uri: str,
         database_name: str,
-        batch_size: int = 1000
+        batch_size: int = 10000,
+        max_workers: int = 8
     ):
-        """Initialize the storage service."""
+        """
+        Initialize the storage service.
+
+        Args:
+            mongodb_uri: MongoDB connection URI
+            database_name: Name of the database
+            batch_size: Number of operations sent per bulk_write call;
+                the driver further splits each call to stay within the
+                server's message size limit
+            max_workers: Number of bulk writes run concurrently; should
+                not exceed the client's maxPoolSize
+        """
         self.client = MongoClient(mongodb_uri)
         self.db = self.client[database_name]
         self.batch_size = batch_size
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._indexed_collections: Set[str] = set()
+        self._stored_count = 0
+
+    def close(self) -> None:
+        """Wait for pending bulk writes and close the MongoDB client."""
+        self._pool.shutdown(wait=True)
+        self.client.close()
 
     def store_event(
         self,
@@ -53,7 +85,12 @@ class DataWarehouseStorage:
 
             event_data['stored_at'] = datetime.utcnow()
             self.db[collection].insert_one(event_data)
-            logger.info(f"Event stored successfully in {collection}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Event stored successfully in {collection}")
+
+            self._stored_count += 1
+            if self._stored_count % LOG_SAMPLE_INTERVAL == 0:
+                logger.info(f"Stored {self._stored_count} events")
             return True
 
         except Exception as e:
@@ -63,7 +100,8 @@ class DataWarehouseStorage:
     def batch_store_events(
         self,
         collection: str,
-        events: List[Dict[str, Any]]
+        events: List[Dict[str, Any]],
+        mode: str = 'upsert'
     ) -> bool:
         """
         Store multiple events in MongoDB using bulk operations.
@@ -71,44 +109,97 @@ class DataWarehouseStorage:
         Args:
             collection: Name of the collection
             events: List of events to store
+            mode: 'upsert' to replace existing events in place, or
+                'insert' for immutable events keyed by event_id as _id;
+                events that are already stored are skipped
             
         Returns:
-            bool: True if all events were stored successfully
+            bool: True if all events were stored successfully; events
+            with neither an _id nor an event_id are rejected
         """
+        if mode not in ('upsert', 'insert'):
+            raise ValueError(f"Unknown batch store mode: {mode}")
+
         try:
+            self._ensure_event_id_index(collection)
+            stored_at = datetime.utcnow()
             operations = []
+            rejected = 0
             for event in events:
-                event['stored_at'] = datetime.utcnow()
-                if '_id' not in event:
-                    operations.append(UpdateOne(
-                        {'event_id': event.get('event_id')},
-                        {'$set': event},
-                        upsert=True
-                    ))
-                else:
-                    operations.append(UpdateOne(
-                        {'_id': event['_id']},
-                        {'$set': event},
-                        upsert=True
-                    ))
-
-                if len(operations) >= self.batch_size:
-                    self._execute_batch(collection, operations)
-                    operations = []
-
-            if operations:
-                self._execute_batch(collection, operations)
+                event['stored_at'] = stored_at
+                operation = self._build_operation(event, mode)
+                if operation is None:
+                    rejected += 1
+                    continue
+                operations.append(operation)
 
-            return True
+            if rejected:
+                logger.error(f"Skipped {rejected} events without an event_id")
+
+            # Operations are built up front so a bad event cannot fail the
+            # call while earlier batches are still being written.
+            futures: List[Future] = [
+                self._pool.submit(
+                    self._execute_batch,
+                    collection,
+                    operations[start:start + self.batch_size],
+                    mode == 'insert'
+                )
+                for start in range(0, len(operations), self.batch_size)
+            ]
+
+            wait(futures)
+            for future in futures:
+                future.result()
+
+            return not rejected
 
         except Exception as e:
             logger.error(f"Error in batch store: {str(e)}")
             return False
 
+    @staticmethod
+    def _build_operation(
+        event: Dict[str, Any],
+        mode: str
+    ) -> Optional[Union[InsertOne, ReplaceOne]]:
+        """
+        Build the bulk write operation for a single event.
+
+        Args:
+            event: Event to store
+            mode: 'upsert' or 'insert', as for batch_store_events
+
+        Returns:
+            MongoDB operation for the event, or None if the event has no
+            usable ID
+        """
+        if mode == 'insert':
+            if event.get('_id') is None:
+                if event.get('event_id') is None:
+                    return None
+                event['_id'] = event['event_id']
+            return InsertOne(event)
+
+        if event.get('_id') is not None:
+            return ReplaceOne({'_id': event['_id']}, event, upsert=True)
+
+        # A null event_id filter would match any document lacking the
+        # field and replace it.
+        if event.get('event_id') is None:
+            return None
+        event.pop('_id', None)
+        return ReplaceOne(
+            {'event_id': event['event_id']},
+            event,
+            upsert=True
+        )
+
     def _execute_batch(
         self,
         collection: str,
-        operations: List[UpdateOne]
+        operations: List[Union[InsertOne, ReplaceOne]],
+        ignore_duplicates: bool = False
     ) -> None:
         """
         Execute a batch of MongoDB operations.
@@ -116,17 +207,46 @@ class DataWarehouseStorage:
         Args:
             collection: Name of the collection
             operations: List of MongoDB operations
+            ignore_duplicates: Treat duplicate key errors as success
         """
         try:
             result = self.db[collection].bulk_write(operations, ordered=False)
             logger.info(
-                f"Batch processed: {result.modified_count} modified, "
+                f"Batch processed: {result.inserted_count} inserted, "
+                f"{result.modified_count} modified, "
                 f"{result.upserted_count} upserted"
             )
         except BulkWriteError as bwe:
+            write_errors = bwe.details.get('writeErrors', [])
+            if (
+                ignore_duplicates
+                and not bwe.details.get('writeConcernErrors')
+                and all(self._is_duplicate(error) for error in write_errors)
+            ):
+                logger.info(
+                    f"Batch processed: {bwe.details.get('nInserted', 0)} "
+                    f"inserted, {len(write_errors)} duplicates skipped"
+                )
+                return
             logger.error(f"Bulk write error: {str(bwe.details)}")
             raise
 
+    @staticmethod
+    def _is_duplicate(error: Dict[str, Any]) -> bool:
+        """
+        Check whether a bulk write error is a genuine ID collision.
+
+        Args:
+            error: Entry from the writeErrors of a BulkWriteError
+
+        Returns:
+            bool: True if the error is a duplicate key on a non-null ID
+        """
+        return (
+            error.get('code') == DUPLICATE_KEY_ERROR
+            and None not in error.get('keyValue', {}).values()
+        )
+
     def query_events(
         self,
         collection: str,
@@ -160,14 +280,67 @@ class DataWarehouseStorage:
         """
         Create indexes for a collection.
         
+        An event_id index is always ensured as well.
+
         Args:
             collection: Name of the collection
             indexes: List of field names to index
         """
         try:
-            for field in indexes:
-                self.db[collection].create_index(field)
+            models = [
+                IndexModel(field) for field in indexes if field != 'event_id'
+            ]
+            if models:
+                self.db[collection].create_indexes(models)
+            self._create_event_id_index(collection)
+            self._indexed_collections.add(collection)
             logger.info(f"Created indexes for {collection}: {indexes}")
         except Exception as e:
             logger.error(f"Error creating indexes: {str(e)}")
             raise
+
+    def _ensure_event_id_index(self, collection: str) -> None:
+        """
+        Ensure the event_id index the first time a collection is written.
+
+        Failures are logged and retried on the next write.
+
+        Args:
+            collection: Name of the collection
+        """
+        if collection in self._indexed_collections:
+            return
+
+        try:
+            self._create_event_id_index(collection)
+        except Exception as e:
+            logger.error(f"Error creating event_id index: {str(e)}")
+            return
+        self._indexed_collections.add(collection)
+
+    def _create_event_id_index(self, collection: str) -> None:
+        """
+        Create an index on event_id unless the collection already has one.
+
+        Any existing index led by event_id is reused. If the collection
+        already holds duplicate event_ids, a non-unique index is created
+        instead of the unique one.
+
+        Args:
+            collection: Name of the collection
+        """
+        target = self.db[collection]
+        for info in target.index_information().values():
+            if info['key'][0][0] == 'event_id':
+                return
+
+        try:
+            target.create_indexes([EVENT_ID_INDEX])
+        except OperationFailure as e:
+            if e.code != DUPLICATE_KEY_ERROR:
+                raise
+            logger.warning(
+                f"Duplicate event_ids in {collection}; "
+                "creating a non-unique event_id index"
+            )
+            target.create_indexes([IndexModel('event_id')])
@@ -0,0 +1,148 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from src.ingestion import DataEvent, DataIngestionService
+
+TIMESTAMP = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def service():
+    with patch('src.ingestion.KafkaProducer'), \
+            patch('src.ingestion.KafkaConsumer'):
+        service = DataIngestionService(
+            bootstrap_servers='localhost:9092',
+            topic_prefix='dw_'
+        )
+    yield service
+    service.close()
+
+
+def make_event(payload, source='test_source'):
+    return DataEvent(
+        source=source,
+        event_type='user_action',
+        timestamp=TIMESTAMP,
+        payload=payload
+    )
+
+
+def test_generate_event_id_ignores_key_order():
+    first = make_event({'a': 1, 'b': 2})
+    second = make_event({'b': 2, 'a': 1})
+    first.generate_event_id()
+    second.generate_event_id()
+
+    assert first.event_id == second.event_id
+    assert len(first.event_id) == 64
+
+
+def test_generate_event_id_accepts_non_str_keys():
+    event = make_event({'counts': {1: 2}})
+    event.generate_event_id()
+
+    assert event.event_id
+
+
+def test_generate_event_id_accepts_big_ints():
+    event = make_event({'value': 1 << 70})
+    event.generate_event_id()
+
+    other = make_event({'value': (1 << 70) + 1})
+    other.generate_event_id()
+
+    assert event.event_id
+    assert event.event_id != other.event_id
+
+    first = make_event({'a': 1 << 70, 'b': 1})
+    second = make_event({'b': 1, 'a': 1 << 70})
+    first.generate_event_id()
+    second.generate_event_id()
+
+    assert first.event_id == second.event_id
+
+
+def test_ingest_events_sends_in_order_and_flushes(service):
+    events = [make_event({'n': n}, source=f's{n % 2}') for n in range(5)]
+    service.ingest_event(make_event({'n': -1}))
+
+    assert service.ingest_events(events) == 5
+
+    sent = [
+        call.kwargs['value'] for call in service.producer.send.call_args_list
+    ]
+    assert sent[1:] == [event.model_dump_json().encode() for event in events]
+    assert service.producer.send.call_args.args[0] == 'dw_user_action'
+    service.producer.flush.assert_called()
+
+
+def test_ingest_after_close_is_rejected(service):
+    service.close()
+
+    assert not service.ingest_event(make_event({'n': 1}))
+    assert service.ingest_events([make_event({'n': 2})]) == 0
+    service.producer.send.assert_not_called()
+
+
+def test_close_is_idempotent(service):
+    service.close()
+    service.close()
+
+    service.producer.close.assert_called_once()
+    service.consumer.close.assert_called_once()
+
+
+def test_idempotence_is_configured_explicitly():
+    with patch('src.ingestion.KafkaProducer') as producer, \
+            patch('src.ingestion.KafkaConsumer'):
+        service = DataIngestionService(
+            bootstrap_servers='localhost:9092',
+            topic_prefix='dw_',
+            acks='all',
+            enable_idempotence=True
+        )
+    service.close()
+
+    config = producer.call_args.kwargs
+    assert config['acks'] == 'all'
+    assert config['enable_idempotence'] is True
+
+
+def test_close_is_registered_at_exit():
+    with patch('src.ingestion.KafkaProducer'), \
+            patch('src.ingestion.KafkaConsumer'), \
+            patch('src.ingestion.atexit') as at_exit:
+        service = DataIngestionService(
+            bootstrap_servers='localhost:9092',
+            topic_prefix='dw_'
+        )
+        at_exit.register.assert_called_once_with(service.close)
+
+        service.close()
+        at_exit.unregister.assert_called_once_with(service.close)
+
+
+def test_changes_after_ingest_are_not_sent(service):
+    event = make_event({'n': 1})
+    assert service.ingest_event(event)
+    expected = event.model_dump_json().encode()
+    event.payload['n'] = 2
+
+    service.close()
+
+    assert service.producer.send.call_args.kwargs['value'] == expected
+
+
+def test_send_queue_is_bounded():
+    with patch('src.ingestion.KafkaProducer'), \
+            patch('src.ingestion.KafkaConsumer'):
+        service = DataIngestionService(
+            bootstrap_servers='localhost:9092',
+            topic_prefix='dw_',
+            max_queued_events=100
+        )
+    service.close()
+
+    assert service._queue.maxsize == 100
@@ -0,0 +1,196 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+from src.storage import (
+    DUPLICATE_KEY_ERROR,
+    EVENT_ID_INDEX,
+    DataWarehouseStorage,
+)
+
+
+@pytest.fixture
+def storage():
+    with patch('src.storage.MongoClient'):
+        storage = DataWarehouseStorage(
+            mongodb_uri='mongodb://localhost:27017',
+            database_name='test'
+        )
+    yield storage
+    storage.close()
+
+
+def duplicate_error(index, event_id):
+    return {
+        'index': index,
+        'code': DUPLICATE_KEY_ERROR,
+        'keyValue': {'_id': event_id},
+        'errmsg': 'E11000 duplicate key error',
+    }
+
+
+def test_insert_mode_uses_event_id_as_id(storage):
+    events = [{'event_id': 'a'}, {'event_id': 'b'}]
+
+    assert storage.batch_store_events('events', events, mode='insert')
+
+    operations = storage.db['events'].bulk_write.call_args.args[0]
+    assert all(isinstance(operation, InsertOne) for operation in operations)
+    assert [event['_id'] for event in events] == ['a', 'b']
+
+
+def test_insert_mode_skips_duplicates(storage):
+    storage.db['events'].bulk_write.side_effect = BulkWriteError({
+        'writeErrors': [duplicate_error(0, 'a')],
+        'writeConcernErrors': [],
+        'nInserted': 1,
+    })
+
+    events = [{'event_id': 'a'}, {'event_id': 'b'}]
+    assert storage.batch_store_events('events', events, mode='insert')
+
+
+def test_insert_mode_fails_on_other_write_errors(storage):
+    storage.db['events'].bulk_write.side_effect = BulkWriteError({
+        'writeErrors': [
+            duplicate_error(0, 'a'),
+            {'index': 1, 'code': 121, 'errmsg': 'Document failed validation'},
+        ],
+        'writeConcernErrors': [],
+        'nInserted': 0,
+    })
+
+    events = [{'event_id': 'a'}, {'event_id': 'b'}]
+    assert not storage.batch_store_events('events', events, mode='insert')
+
+
+def test_insert_mode_fails_on_null_key_errors(storage):
+    storage.db['events'].bulk_write.side_effect = BulkWriteError({
+        'writeErrors': [duplicate_error(0, None)],
+        'writeConcernErrors': [],
+        'nInserted': 0,
+    })
+
+    events = [{'event_id': 'a'}]
+    assert not storage.batch_store_events('events', events, mode='insert')
+
+
+def test_insert_mode_stores_events_with_id_and_null_event_id(storage):
+    events = [
+        {'_id': 'a', 'event_id': None},
+        {'_id': 'b', 'event_id': None},
+    ]
+
+    assert storage.batch_store_events('events', events, mode='insert')
+
+    operations = storage.db['events'].bulk_write.call_args.args[0]
+    assert operations == [InsertOne(events[0]), InsertOne(events[1])]
+
+
+def test_store_event_with_null_event_id(storage):
+    event = {'source': 'x', 'event_id': None}
+
+    assert storage.store_event('events', event, event_id='a')
+
+    storage.db['events'].insert_one.assert_called_once_with(event)
+
+
+def test_event_id_index_only_covers_string_ids():
+    document = EVENT_ID_INDEX.document
+
+    assert document['key'] == {'event_id': 1}
+    assert document['unique'] is True
+    assert document['partialFilterExpression'] == {
+        'event_id': {'$type': 'string'}
+    }
+    assert 'sparse' not in document
+
+
+def test_insert_mode_rejects_events_without_event_id(storage):
+    events = [{'event_id': 'a'}, {'event_id': None}, {'source': 'x'}]
+
+    assert not storage.batch_store_events('events', events, mode='insert')
+
+    operations = storage.db['events'].bulk_write.call_args.args[0]
+    assert len(operations) == 1
+    assert '_id' not in events[1]
+    assert '_id' not in events[2]
+
+
+def test_upsert_mode_filters_on_id_or_event_id(storage):
+    events = [{'_id': 'a', 'event_id': 'a'}, {'event_id': 'b'}]
+
+    assert storage.batch_store_events('events', events)
+
+    operations = storage.db['events'].bulk_write.call_args.args[0]
+    assert operations == [
+        ReplaceOne({'_id': 'a'}, events[0], upsert=True),
+        ReplaceOne({'event_id': 'b'}, events[1], upsert=True),
+    ]
+
+
+def test_upsert_mode_rejects_events_without_event_id(storage):
+    events = [{'event_id': 'a'}, {'_id': None, 'event_id': None}]
+
+    assert not storage.batch_store_events('events', events)
+
+    operations = storage.db['events'].bulk_write.call_args.args[0]
+    assert operations == [
+        ReplaceOne({'event_id': 'a'}, events[0], upsert=True),
+    ]
+
+
+def test_batch_store_events_rejects_unknown_mode(storage):
+    with pytest.raises(ValueError):
+        storage.batch_store_events('events', [], mode='merge')
+
+
+def test_event_id_index_reuses_existing_index(storage):
+    collection = storage.db['events']
+    collection.index_information.return_value = {
+        '_id_': {'key': [('_id', 1)]},
+        'event_id_1': {'key': [('event_id', 1)]},
+    }
+
+    storage.create_indexes('events', ['event_id', 'source'])
+
+    models = collection.create_indexes.call_args.args[0]
+    assert [model.document['key'] for model in models] == [{'source': 1}]
+    assert collection.create_indexes.call_count == 1
+
+
+def test_event_id_index_falls_back_on_duplicates(storage):
+    collection = storage.db['events']
+    collection.index_information.return_value = {}
+    collection.create_indexes.side_effect = [
+        OperationFailure('duplicate key', code=DUPLICATE_KEY_ERROR),
+        ['event_id_1'],
+    ]
+
+    assert storage.batch_store_events('events', [])
+
+    calls = collection.create_indexes.call_args_list
+    assert calls[0].args[0] == [EVENT_ID_INDEX]
+    assert 'unique' not in calls[1].args[0][0].document
+    assert 'events' in storage._indexed_collections
+
+
+def test_event_id_index_failure_is_retried(storage):
+    collection = storage.db['events']
+    collection.index_information.return_value = {}
+    collection.create_indexes.side_effect = OperationFailure('timeout')
+
+    storage.batch_store_events('events', [])
+    assert 'events' not in storage._indexed_collections
+
+    collection.create_indexes.side_effect = None
+    storage.batch_store_events('events', [])
+    assert 'events' in storage._indexed_collections
+
+
+def test_close_shuts_down_client(storage):
+    storage.client = MagicMock()
+    storage.close()
+    storage.client.close.assert_called_once()